@@ -0,0 +1,405 @@
+import argparse
+import concurrent.futures
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import zipfile
+from tempfile import TemporaryDirectory
+
+import cv2
+import numpy as np
+import psutil
+
+from frame_extractor import (
+    EXECUTION_BACKENDS, OutputFormat, ZipWriter, encode_array_batch, encode_frame, extract_batch, extract_frames,
+    open_frame_queue
+)
+from uploads import save_upload
+
+BENCHMARKS = ["decode", "batch", "upload", "output", "formats", "import"]
+
+# Output formats compared by the formats benchmark
+FORMAT_CASES = {
+    "jpg": OutputFormat("jpg"),
+    "jpg q80": OutputFormat("jpg", quality=80),
+    "jpg q80 prog+opt": OutputFormat("jpg", quality=80, progressive=True, optimize=True),
+    "webp q80": OutputFormat("webp", quality=80),
+    "png c1": OutputFormat("png", png_compression=1),
+    "png c9": OutputFormat("png", png_compression=9),
+    "npy": OutputFormat("npy", batch_size=0),
+    "npz": OutputFormat("npz", batch_size=0),
+}
+
+# Modules whose cold import time is measured (cv2 and psutil as a reference),
+# and the heavy native modules that should stay unloaded until needed
+IMPORT_MODULES = ["streamlit_app", "frame_extractor", "cli", "cv2", "psutil"]
+HEAVY_MODULES = ["cv2", "psutil"]
+
+# Container extension for each codec the synthetic videos can be written with
+CODEC_EXTENSIONS = {"mp4v": ".mp4", "MJPG": ".avi", "XVID": ".avi", "FFV1": ".mkv", "VP80": ".webm"}
+
+# Decode strategies compared by the decode benchmark
+DECODE_MODES = {
+    "read": {"grab_only": False, "seek": False},
+    "grab": {"grab_only": True, "seek": False},
+    "seek": {"seek": True},
+}
+
+
+# Function to write a synthetic test video with a moving gradient; returns
+# False when the codec is not available in this OpenCV build
+def generate_video(path, fps, duration, width=1280, height=720, codec="mp4v"):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        return False
+    base = np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))
+    for i in range(int(fps * duration)):
+        frame = np.roll(base, i * 8, axis=1)
+        writer.write(cv2.merge([frame, np.flipud(frame), np.full_like(frame, i % 256)]))
+    writer.release()
+    return True
+
+
+# Function to generate every requested combination of synthetic video
+def generate_videos(work_dir, resolutions, source_fps_values, codecs, durations):
+    videos = []
+    for width, height in resolutions:
+        for source_fps in source_fps_values:
+            for codec in codecs:
+                for duration in durations:
+                    spec = {
+                        "resolution": f"{width}x{height}", "source_fps": source_fps, "codec": codec,
+                        "duration": duration,
+                    }
+                    name = f"{width}x{height}_{source_fps}fps_{codec}_{duration}s{CODEC_EXTENSIONS[codec]}"
+                    path = os.path.join(work_dir, name)
+                    if generate_video(path, source_fps, duration, width, height, codec):
+                        videos.append((spec, path))
+                    else:
+                        print(f"Skipping codec {codec}: not supported by this OpenCV build", file=sys.stderr)
+    return videos
+
+
+# Peak resident set size of this process and of its largest child, in MB
+def peak_rss_mb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+# Run a benchmark case in a fresh process so its peak RSS is not masked by
+# earlier cases, and return the case's record with the RSS growth added
+def run_isolated(func, *args):
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(measure, func, *args).result()
+
+
+# Peak RSS is reported as growth over the peak right before the case runs,
+# after this module and its imports have loaded
+def measure(func, *args):
+    baseline = peak_rss_mb()
+    record = func(*args)
+    record.setdefault("rss_growth_mb", peak_rss_mb() - baseline)
+    return record
+
+
+# Counts encoded frames without keeping them, to time extraction alone
+class DiscardSink:
+    def __init__(self):
+        self.bytes = 0
+
+    def put(self, item):
+        self.bytes += len(item[1])
+
+
+def decode_case(video_path, target_fps, options):
+    cap = cv2.VideoCapture(video_path)
+    source_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    sink = DiscardSink()
+    start = time.perf_counter()
+    saved = extract_frames(video_path, sink, target_fps, **options).files
+    elapsed = time.perf_counter() - start
+    return {
+        "wall_s": elapsed,
+        "frames": saved,
+        "frames_per_s": saved / elapsed,
+        "source_frames_per_s": source_frames / elapsed,
+        "input_mb_per_s": os.path.getsize(video_path) / 1e6 / elapsed,
+        "output_mb": sink.bytes / 1e6,
+    }
+
+
+# Check that every file reported as written is in the archive under a name of
+# its own; fewer distinct names means frames overwrote each other
+def check_archive(archive, saved):
+    with zipfile.ZipFile(archive) as zipf:
+        names = set(zipf.namelist())
+    if len(names) != saved:
+        raise RuntimeError(f"{saved} files reported but {len(names)} distinct names in the archive")
+
+
+def batch_case(video_paths, target_fps, backend, max_workers):
+    archive = io.BytesIO()
+    start = time.perf_counter()
+    saved = sum(result.files for result in extract_batch(video_paths, archive, target_fps, backend, max_workers))
+    elapsed = time.perf_counter() - start
+    check_archive(archive, saved)
+    input_mb = sum(os.path.getsize(path) for path in video_paths) / 1e6
+    return {
+        "wall_s": elapsed,
+        "frames": saved,
+        "frames_per_s": saved / elapsed,
+        "input_mb_per_s": input_mb / elapsed,
+        "output_mb": archive.getbuffer().nbytes / 1e6,
+    }
+
+
+# Copy an in-memory upload to disk and report how far peak RSS grew
+def upload_case(strategy, size_mb, path):
+    upload = io.BytesIO()
+    chunk = os.urandom(1024 * 1024)
+    for _ in range(size_mb):
+        upload.write(chunk)
+    upload.seek(0)
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if strategy == "read":
+        with open(path, "wb") as f:
+            f.write(upload.read())
+    else:
+        save_upload(upload, path)
+    elapsed = time.perf_counter() - start
+    return {"wall_s": elapsed, "input_mb_per_s": size_mb / elapsed, "rss_growth_mb": peak_rss_mb() - baseline}
+
+
+# Write JPEGs to disk and zip them afterwards, or encode in memory straight
+# into the archive
+def output_case(video_path, target_fps, mode, work_dir):
+    archive = io.BytesIO()
+    start = time.perf_counter()
+    if mode == "disk":
+        with TemporaryDirectory(dir=work_dir) as output_path:
+            saved = extract_frames(video_path, output_path, target_fps).files
+            with zipfile.ZipFile(archive, "w") as zipf:
+                for root, _, files in os.walk(output_path):
+                    for file in files:
+                        path = os.path.join(root, file)
+                        zipf.write(path, arcname=os.path.relpath(path, output_path))
+    else:
+        with open_frame_queue("threads") as frame_queue, ZipWriter(archive, frame_queue):
+            saved = extract_frames(video_path, frame_queue, target_fps).files
+    elapsed = time.perf_counter() - start
+    check_archive(archive, saved)
+    return {
+        "wall_s": elapsed,
+        "frames": saved,
+        "frames_per_s": saved / elapsed,
+        "output_mb": archive.getbuffer().nbytes / 1e6,
+    }
+
+
+# Encode the same decoded frames in one output format and report encode time
+# and output size
+def format_case(video_path, max_frames, output_format):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+
+    start = time.perf_counter()
+    if output_format.is_array:
+        output_bytes = len(encode_array_batch(frames, [0.0] * len(frames), output_format))
+    else:
+        output_bytes = sum(len(encode_frame(frame, output_format)) for frame in frames)
+    elapsed = time.perf_counter() - start
+    return {
+        "wall_s": elapsed,
+        "frames": len(frames),
+        "encode_ms_per_frame": elapsed * 1000 / len(frames),
+        "kb_per_frame": output_bytes / 1024 / len(frames),
+    }
+
+
+# Import a module in a fresh interpreter under -X importtime and report its
+# cumulative import time and which heavy modules it pulled in
+def import_case(module):
+    check = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    elapsed = time.perf_counter() - start
+
+    # importtime lines look like "import time:  self [us] | cumulative | name"
+    cumulative_us = 0
+    for line in completed.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+    return {
+        "wall_s": elapsed,
+        "import_ms": cumulative_us / 1000,
+        "heavy_loaded": completed.stdout.strip() or "-",
+    }
+
+
+# Keep the fastest of several runs; RSS growth is the largest seen
+def best_of(repeat, func, *args):
+    records = [run_isolated(func, *args) for _ in range(repeat)]
+    best = min(records, key=lambda record: record["wall_s"])
+    best["rss_growth_mb"] = max(record["rss_growth_mb"] for record in records)
+    return best
+
+
+def bench_decode(videos, target_fps_values, repeat):
+    results = []
+    for spec, video_path in videos:
+        for target_fps in target_fps_values:
+            for mode, options in DECODE_MODES.items():
+                record = best_of(repeat, decode_case, video_path, target_fps, options)
+                results.append({"benchmark": "decode", **spec, "target_fps": target_fps, "mode": mode, **record})
+    return results
+
+
+# Batch throughput for each backend as the worker count grows
+def bench_batch(videos, target_fps_values, num_files, repeat):
+    spec, video_path = videos[0]
+    cpu_count = psutil.cpu_count() or 1
+    results = []
+    for target_fps in target_fps_values:
+        for backend in EXECUTION_BACKENDS:
+            for max_workers in sorted({1, *range(2, cpu_count + 1, 2), cpu_count}):
+                record = best_of(repeat, batch_case, [video_path] * num_files, target_fps, backend, max_workers)
+                results.append({
+                    "benchmark": "batch", **spec, "files": num_files, "target_fps": target_fps,
+                    "backend": backend, "workers": max_workers, **record,
+                })
+    return results
+
+
+def bench_upload(work_dir, size_mb):
+    path = os.path.join(work_dir, "upload.bin")
+    results = []
+    for strategy in ("read", "chunked"):
+        record = run_isolated(upload_case, strategy, size_mb, path)
+        results.append({"benchmark": "upload", "size_mb": size_mb, "strategy": strategy, **record})
+    return results
+
+
+def bench_output(work_dir, videos, target_fps_values, repeat):
+    spec, video_path = videos[0]
+    results = []
+    for target_fps in target_fps_values:
+        for mode in ("disk", "memory"):
+            record = best_of(repeat, output_case, video_path, target_fps, mode, work_dir)
+            results.append({"benchmark": "output", **spec, "target_fps": target_fps, "output": mode, **record})
+    return results
+
+
+def bench_formats(videos, max_frames, repeat):
+    spec, video_path = videos[-1]
+    results = []
+    for case, output_format in FORMAT_CASES.items():
+        record = best_of(repeat, format_case, video_path, max_frames, output_format)
+        results.append({"benchmark": "formats", **spec, "format": case, **record})
+    return results
+
+
+def bench_import(repeat):
+    results = []
+    for module in IMPORT_MODULES:
+        record = min((import_case(module) for _ in range(repeat)), key=lambda record: record["import_ms"])
+        results.append({"benchmark": "import", "module": module, **record})
+    return results
+
+
+# Print records as plain tables, one per benchmark
+def print_tables(results):
+    for benchmark in dict.fromkeys(record["benchmark"] for record in results):
+        records = [record for record in results if record["benchmark"] == benchmark]
+        columns = [column for column in records[0] if column != "benchmark"]
+        print(f"\n== {benchmark} ==")
+        print(" ".join(f"{column:>14}" for column in columns))
+        for record in records:
+            print(" ".join(
+                f"{record[column]:>14.3f}" if isinstance(record[column], float) else f"{record[column]!s:>14}"
+                for column in columns
+            ))
+
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame extraction on synthetic videos.")
+    parser.add_argument("--bench", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+", default=[(640, 360), (1280, 720)])
+    parser.add_argument("--source-fps", type=int, nargs="+", default=[30, 60])
+    parser.add_argument("--codecs", nargs="+", choices=list(CODEC_EXTENSIONS), default=["mp4v", "MJPG"])
+    parser.add_argument("--durations", type=float, nargs="+", default=[10], help="Video durations in seconds")
+    parser.add_argument("--target-fps", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--files", type=int, default=psutil.cpu_count() or 1, help="Videos in the batch benchmark")
+    parser.add_argument("--upload-mb", type=int, default=256, help="Upload size for the copy benchmark")
+    parser.add_argument("--format-frames", type=int, default=60, help="Frames encoded per format")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", metavar="PATH", help="Write results as JSON to PATH ('-' for stdout only)")
+    args = parser.parse_args()
+
+    results = []
+    with TemporaryDirectory() as work_dir:
+        videos = []
+        if {"decode", "batch", "output", "formats"} & set(args.bench):
+            videos = generate_videos(work_dir, args.resolutions, args.source_fps, args.codecs, args.durations)
+            if not videos:
+                parser.error("none of the requested codecs are available")
+        if "decode" in args.bench:
+            results += bench_decode(videos, args.target_fps, args.repeat)
+        if "batch" in args.bench:
+            results += bench_batch(videos, args.target_fps, args.files, args.repeat)
+        if "upload" in args.bench:
+            results += bench_upload(work_dir, args.upload_mb)
+        if "output" in args.bench:
+            results += bench_output(work_dir, videos, args.target_fps, args.repeat)
+        if "formats" in args.bench:
+            results += bench_formats(videos, args.format_frames, args.repeat)
+        if "import" in args.bench:
+            results += bench_import(args.repeat)
+
+    report = {
+        "system": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "cpu_count": psutil.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        return
+
+    print_tables(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
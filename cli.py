@@ -0,0 +1,152 @@
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+
+from disk_budget import disk_budget, estimate_job, fit_scale, probe_video
+from frame_extractor import (
+    ARRAY_BATCH_SIZE, EXECUTION_BACKENDS, OUTPUT_FORMATS, OutputFormat, can_split, extract_batch,
+    plan_workers, segments_per_file
+)
+from stage_timer import StageTimer
+
+
+# Function to expand input paths and glob patterns into a sorted, de-duplicated
+# list of files
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        paths.extend(path for path in matches if os.path.isfile(path))
+    return sorted(set(paths))
+
+
+def positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: {value}")
+    return number
+
+
+def parse_grid(value):
+    columns, rows = value.lower().split("x")
+    return int(columns), int(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract frames from videos without the Streamlit UI.")
+    parser.add_argument("inputs", nargs="+", help="Video paths or glob patterns (quote globs, ** is recursive)")
+    parser.add_argument("--fps", type=positive_float, default=1, help="Frames to extract per second of video")
+    parser.add_argument(
+        "--workers", type=int, help="Cores to use, split between worker and OpenCV threads (default: all)"
+    )
+    parser.add_argument("--backend", choices=EXECUTION_BACKENDS, default="processes")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--output-dir", help="Directory to write frames into")
+    output.add_argument("--zip", help="ZIP archive to write frames into")
+    parser.add_argument(
+        "--dedup-threshold", type=int, metavar="BITS",
+        help="Drop frames whose 64-bit difference hash is within BITS of the last saved frame",
+    )
+    parser.add_argument(
+        "--scene-threshold", type=float, metavar="LEVELS",
+        help="Keep a frame (checked at --fps) only on a scene change of at least this mean gray-level difference",
+    )
+    parser.add_argument("--scene-min-interval", type=float, default=0.0, metavar="SECONDS")
+    parser.add_argument("--scene-max-interval", type=float, metavar="SECONDS")
+    parser.add_argument("--max-width", type=int, help="Shrink frames to at most this width")
+    parser.add_argument("--max-height", type=int, help="Shrink frames to at most this height")
+    parser.add_argument("--scale", type=float, help="Scale factor applied to frames (at most 1)")
+    parser.add_argument(
+        "--grid", type=parse_grid, metavar="COLSxROWS", help="Pack frames into thumbnail grids, e.g. 4x4"
+    )
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="jpg", help="Output codec or array format")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP quality (0-100)")
+    parser.add_argument("--progressive", action="store_true", help="Write progressive JPEGs")
+    parser.add_argument("--optimize", action="store_true", help="Optimize JPEG Huffman tables")
+    parser.add_argument("--png-compression", type=int, help="PNG compression level (0-9)")
+    parser.add_argument(
+        "--batch-size", type=int, default=ARRAY_BATCH_SIZE,
+        help="Frames per .npy/.npz file (0 = one file per video)",
+    )
+    parser.add_argument(
+        "--low-disk", choices=("refuse", "downscale", "ignore"), default="refuse",
+        help="What to do when the estimated output does not fit on the output filesystem",
+    )
+    parser.add_argument("--timings", metavar="PATH", help="Write per-stage timings as JSON to PATH")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    # extract_batch tells archives from directories by the .zip suffix
+    if args.zip and not args.zip.lower().endswith(".zip"):
+        parser.error("--zip must be a path ending in .zip")
+    if args.output_dir and args.output_dir.lower().endswith(".zip"):
+        parser.error("--output-dir must not end in .zip")
+    video_paths = expand_inputs(args.inputs)
+    if not video_paths:
+        parser.error("no input files matched")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    output_format = OutputFormat(
+        args.format, args.quality, args.progressive, args.optimize, args.png_compression, args.batch_size
+    )
+    options = dict(
+        dedup_threshold=args.dedup_threshold, scene_threshold=args.scene_threshold,
+        scene_min_interval=args.scene_min_interval, scene_max_interval=args.scene_max_interval,
+        max_width=args.max_width, max_height=args.max_height, scale=args.scale, thumbnail_grid=args.grid,
+        output_format=output_format,
+    )
+
+    videos = [probe_video(path) for path in video_paths]
+    segments = segments_per_file(len(videos), args.workers) if can_split(options) else 1
+    workers, _ = plan_workers(len(videos) * segments, args.workers)
+    estimate = estimate_job(videos, args.fps, workers, **options)
+    logging.info(
+        "Estimated output: up to %d frames in %d files, %.1f MB, about %.0f s to decode",
+        estimate.frames, estimate.files, estimate.output_bytes / 1024 ** 2, estimate.decode_seconds,
+    )
+    if args.low_disk != "ignore":
+        output_dir = args.output_dir or os.path.dirname(os.path.abspath(args.zip))
+        budget = disk_budget(output_dir)
+        scale = fit_scale(videos, args.fps, budget, **options)
+        if scale is None or (scale != (args.scale or 1.0) and args.low_disk == "refuse"):
+            logging.error(
+                "Not enough free space in %s: output needs about %.1f MB, %.1f MB available",
+                output_dir, estimate.output_bytes / 1024 ** 2, max(budget, 0) / 1024 ** 2,
+            )
+            return 1
+        if scale != (args.scale or 1.0):
+            logging.warning("Scaling frames to %.0f%% to fit in %s", scale * 100, output_dir)
+            options["scale"] = scale
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    results = extract_batch(
+        video_paths, args.output_dir or args.zip, args.fps, args.backend, args.workers, timer=timer, **options
+    )
+    elapsed = time.perf_counter() - start
+    for result in results:
+        if result.error:
+            logging.error("Failed on %s: %s", result.video_path, result.error)
+        elif result.skipped:
+            logging.warning("Skipped %s: %s", result.video_path, result.skipped)
+    kept_frames = sum(result.frames for result in results)
+    written_files = sum(result.files for result in results)
+    logging.info(
+        "Kept %d frames in %d files from %d videos in %.2f s", kept_frames, written_files, len(video_paths), elapsed
+    )
+
+    if args.timings:
+        with open(args.timings, "w") as f:
+            f.write(timer.to_json())
+    if any(result.error for result in results):
+        return 1
+    return 0 if written_files > 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# Lets pytest import the top-level modules (frame_extractor, uploads, ...)
+# from tests/ without installing the package
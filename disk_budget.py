@@ -0,0 +1,119 @@
+import collections
+import math
+import shutil
+
+from frame_extractor import (
+    SEEK_PREROLL_FRAMES, SEEK_RATIO_THRESHOLD, TYPICAL_GOP_FRAMES, OutputFormat, output_size
+)
+
+# Rough encoded size per output pixel at default encoder settings, on the high
+# side for camera footage so estimates err towards refusing; npy is exact
+BYTES_PER_PIXEL = {"jpg": 0.25, "webp": 0.15, "png": 1.5, "npy": 3.0, "npz": 1.5}
+
+# ZIP local header plus central directory entry, per file
+ZIP_ENTRY_OVERHEAD = 128
+
+# Decode throughput of one worker (source pixels per second) and the frames
+# decoded per sample when seeking: the pre-roll plus, on average, half a GOP
+# back to the previous keyframe
+DECODE_PIXELS_PER_SECOND = 200e6
+SEEK_FRAMES_PER_SAMPLE = SEEK_PREROLL_FRAMES + TYPICAL_GOP_FRAMES // 2
+
+# Free space left untouched on the output filesystem
+DISK_HEADROOM_BYTES = 256 * 1024 ** 2
+
+# Available memory left untouched when output is built in memory
+MEMORY_HEADROOM_BYTES = 512 * 1024 ** 2
+
+# Size of an io.BytesIO buffer relative to its contents: it over-allocates by
+# up to an eighth as it grows
+BYTES_IO_GROWTH = 1.125
+
+# Smallest scale factor a job is downsampled to before it is refused
+MIN_FIT_SCALE = 0.25
+
+VideoInfo = collections.namedtuple("VideoInfo", ["fps", "frame_count", "width", "height"])
+JobEstimate = collections.namedtuple("JobEstimate", ["frames", "files", "output_bytes", "decode_seconds"])
+
+# Function to read the stream properties the estimate needs from the
+# container header, without decoding any frames
+def probe_video(video_path):
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    info = VideoInfo(
+        cap.get(cv2.CAP_PROP_FPS), max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))),
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    )
+    cap.release()
+    return info
+
+# Function to predict how many frames and files a job produces, how many bytes
+# they take and how long decoding takes across workers. Videos without a
+# usable FPS or frame count are skipped by extraction and count as empty.
+# Scene and dedup filters only ever drop frames, so with them the estimate
+# is an upper bound.
+def estimate_job(
+    videos, target_fps, workers=1, output_format=None, max_width=None, max_height=None, scale=None,
+    thumbnail_grid=None, **filters
+):
+    output_format = output_format or OutputFormat()
+    frames = files = output_bytes = decoded_pixels = 0
+    for video in videos:
+        if not video.fps or not video.frame_count:
+            continue
+        duration_s = video.frame_count / video.fps
+        video_frames = math.ceil(duration_s * target_fps)
+        width, height = output_size(video.width, video.height, max_width, max_height, scale)
+
+        if thumbnail_grid:
+            video_files = math.ceil(video_frames / (thumbnail_grid[0] * thumbnail_grid[1]))
+        else:
+            video_files = video_frames
+        if output_format.is_array:
+            batch_size = output_format.batch_size or video_files
+            video_files = math.ceil(video_files / batch_size)
+
+        if video.fps / target_fps >= SEEK_RATIO_THRESHOLD:
+            decoded_frames = min(video.frame_count, video_frames * SEEK_FRAMES_PER_SAMPLE)
+        else:
+            decoded_frames = video.frame_count
+
+        frames += video_frames
+        files += video_files
+        output_bytes += video_frames * width * height * BYTES_PER_PIXEL[output_format.name]
+        output_bytes += video_files * ZIP_ENTRY_OVERHEAD
+        decoded_pixels += decoded_frames * video.width * video.height
+
+    decode_seconds = decoded_pixels / DECODE_PIXELS_PER_SECOND / max(1, workers)
+    return JobEstimate(frames, files, int(output_bytes), decode_seconds)
+
+# Function to get the bytes a job may write on the filesystem holding path
+def disk_budget(path):
+    return shutil.disk_usage(path).free - DISK_HEADROOM_BYTES
+
+# Function to get the output bytes a job may build in memory, in an io.BytesIO
+# that is handed over without a copy once complete (getvalue())
+def memory_budget():
+    import psutil
+    return int((psutil.virtual_memory().available - MEMORY_HEADROOM_BYTES) / BYTES_IO_GROWTH)
+
+# Function to find the scale factor a job has to be shrunk to for its output
+# to fit in budget_bytes. Returns the job's own scale (1.0 when unset) when it
+# already fits and None when it would not fit even at MIN_FIT_SCALE.
+def fit_scale(videos, target_fps, budget_bytes, **options):
+    scale = options.pop("scale", None) or 1.0
+    if estimate_job(videos, target_fps, scale=scale, **options).output_bytes <= budget_bytes:
+        return scale
+
+    # Videos that cannot be read produce nothing, so shrinking cannot help
+    needed = estimate_job(videos, target_fps, **options).output_bytes
+    if not needed:
+        return scale
+    # Output grows with the pixel count, so start from the square root of the
+    # overshoot and step down until rounding and per-file overhead fit too
+    candidate = min(scale, math.sqrt(max(budget_bytes, 0) / needed))
+    while candidate >= MIN_FIT_SCALE:
+        if estimate_job(videos, target_fps, scale=candidate, **options).output_bytes <= budget_bytes:
+            return candidate
+        candidate *= 0.9
+    return None
@@ -0,0 +1,828 @@
+import collections
+import contextlib
+import io
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zipfile
+import concurrent.futures
+import traceback
+from stage_timer import StageTimer
+
+EXECUTION_BACKENDS = ("threads", "processes")
+
+# cv2 and psutil are imported inside the functions that use them, so importing
+# this module (e.g. on a Streamlit cold start) does not load the native libraries
+
+# Start method for worker and manager processes. Forking a process that
+# already runs threads (app jobs, the metrics sampler, the ZIP writer,
+# OpenCV's pool) can deadlock the child, so they start from a clean process.
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Encoded frames allowed to wait for the ZIP writer before workers block
+FRAME_QUEUE_SIZE = 256
+
+# Frames OpenCV's FFmpeg backend decodes on every seek before reaching the
+# target: it jumps to the keyframe at or before the target less this many
+# frames and decodes forward from there
+SEEK_PREROLL_FRAMES = 16
+
+# Keyframe interval assumed for real footage; camera and streaming H.264 is
+# commonly encoded with 2-10 s GOPs (cv2.VideoWriter's 12 frames is atypical)
+TYPICAL_GOP_FRAMES = 250
+
+# Source/target frame ratio above which seeking to each sample beats decoding
+# the whole stream sequentially: the frames skipped between samples must
+# clearly exceed what one seek decodes, i.e. about 9 s between samples at 30 FPS
+SEEK_RATIO_THRESHOLD = TYPICAL_GOP_FRAMES + SEEK_PREROLL_FRAMES
+
+# Slack allowed when comparing frame timestamps against sample slots (ms)
+TIMESTAMP_TOLERANCE_MS = 1.0
+
+# Shortest time range worth handing to a separate worker (ms)
+MIN_SEGMENT_MS = 30_000
+
+# Outcome of extracting one video (or one segment of it): frames kept after
+# sampling and filtering, files written (fewer than frames with thumbnail
+# grids or array batches), why the video was skipped and the error that
+# stopped it (None when neither happened), and StageTimer records
+ExtractionResult = collections.namedtuple(
+    "ExtractionResult", ["video_path", "frames", "files", "skipped", "error", "timings"]
+)
+
+# Seconds between progress reports from one extract_frames call
+PROGRESS_INTERVAL = 0.5
+
+# Progress of one extract_frames call: position is how many of the segment's
+# segment_frames have been passed (by decoding or seeking), frame_count is
+# the whole video's CAP_PROP_FRAME_COUNT (0 when unknown), saved is files
+# written so far and decoded is frames grabbed in elapsed seconds
+FrameProgress = collections.namedtuple(
+    "FrameProgress",
+    ["video_path", "start_ms", "position", "segment_frames", "frame_count", "saved", "decoded", "elapsed"],
+)
+
+# Picks frames by presentation timestamp so the output matches target_fps
+# exactly, without integer-interval drift and on variable-frame-rate files
+class FrameSampler:
+    def __init__(self, target_fps, start_ms=0.0):
+        self.step_ms = 1000.0 / target_fps
+        # Start on the global sample grid so segments of one video line up
+        self.next_ms = math.ceil(start_ms / self.step_ms - 1e-9) * self.step_ms
+
+    def should_sample(self, timestamp_ms):
+        if timestamp_ms + TIMESTAMP_TOLERANCE_MS < self.next_ms:
+            return False
+        # Skip every slot this frame covers so gaps in VFR streams don't
+        # produce a burst of samples from the next frame
+        while self.next_ms <= timestamp_ms + TIMESTAMP_TOLERANCE_MS:
+            self.next_ms += self.step_ms
+        return True
+
+# Image formats are encoded per frame with OpenCV; array formats pack batches
+# of frames into NumPy .npy / .npz files
+OUTPUT_FORMATS = ("jpg", "webp", "png", "npy", "npz")
+ARRAY_FORMATS = ("npy", "npz")
+
+# Frames per .npy/.npz file unless the output format says otherwise
+ARRAY_BATCH_SIZE = 256
+
+# How frames are written out: the format plus its encoder settings. quality
+# applies to JPEG and WebP (0-100), progressive/optimize to JPEG,
+# png_compression to PNG (0-9) and batch_size to the array formats (0 puts
+# every frame of a video into one file, held in memory until the video ends).
+class OutputFormat:
+    def __init__(
+        self, name="jpg", quality=None, progressive=False, optimize=False, png_compression=None,
+        batch_size=ARRAY_BATCH_SIZE
+    ):
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format {name!r}, expected one of {OUTPUT_FORMATS}")
+        self.name = name
+        self.quality = quality
+        self.progressive = progressive
+        self.optimize = optimize
+        self.png_compression = png_compression
+        self.batch_size = batch_size
+
+    @property
+    def extension(self):
+        return f".{self.name}"
+
+    @property
+    def is_array(self):
+        return self.name in ARRAY_FORMATS
+
+    # Parameters for cv2.imencode / cv2.imwrite
+    def params(self):
+        import cv2
+        params = []
+        if self.name == "jpg":
+            if self.quality is not None:
+                params += [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+            if self.progressive:
+                params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+            if self.optimize:
+                params += [cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        elif self.name == "webp" and self.quality is not None:
+            params += [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        elif self.name == "png" and self.png_compression is not None:
+            params += [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        return params
+
+    def settings(self):
+        return dict(vars(self))
+
+# Function to encode a frame in memory in an image output format
+def encode_frame(frame, output_format=None):
+    import cv2
+    output_format = output_format or OutputFormat()
+    success, buffer = cv2.imencode(output_format.extension, frame, output_format.params())
+    if not success:
+        raise ValueError(f"Failed to encode frame as {output_format.name}")
+    return buffer.tobytes()
+
+# Function to pack a batch of equally sized frames into .npy bytes (frames
+# only) or .npz bytes (frames plus their timestamps in ms)
+def encode_array_batch(frames, timestamps_ms, output_format):
+    import numpy as np
+    buffer = io.BytesIO()
+    stacked = np.stack(frames)
+    if output_format.name == "npz":
+        np.savez_compressed(buffer, frames=stacked, timestamps_ms=np.asarray(timestamps_ms))
+    else:
+        np.save(buffer, stacked)
+    return buffer.getvalue()
+
+# Function to compute a 64-bit difference hash of a frame: the frame is shrunk
+# to 9x8 grayscale and each bit records whether a pixel is brighter than its
+# right-hand neighbour, so near-identical frames get hashes a few bits apart
+def frame_hash(frame):
+    import cv2
+    import numpy as np
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = np.packbits(small[:, 1:] > small[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+# Function to count the bits that differ between two frame hashes
+def hash_distance(a, b):
+    return bin(a ^ b).count("1")
+
+# Size frames are shrunk to (grayscale) before comparing them for scene changes
+SCENE_THUMBNAIL_SIZE = (64, 36)
+
+# Emits a frame when the picture changes: the mean absolute difference between
+# downscaled grayscale versions of a candidate frame and the last emitted frame
+# must reach threshold (in gray levels, 0-255), so gradual changes add up and a
+# cut held back by min_interval is still emitted afterwards. Emitted frames are
+# at least min_interval seconds apart, and with max_interval a frame is emitted
+# at least that often even without a change.
+class SceneDetector:
+    def __init__(self, threshold, min_interval=0.0, max_interval=None):
+        self.threshold = threshold
+        self.min_interval_ms = min_interval * 1000
+        self.max_interval_ms = max_interval * 1000 if max_interval else None
+        self.last_emitted = None
+        self.last_emit_ms = None
+
+    def is_new_scene(self, frame, timestamp_ms):
+        import cv2
+        import numpy as np
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        thumbnail = cv2.resize(gray, SCENE_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+        if self.last_emitted is not None:
+            elapsed_ms = timestamp_ms - self.last_emit_ms
+            if elapsed_ms < self.min_interval_ms:
+                return False
+            changed = np.abs(thumbnail - self.last_emitted).mean() >= self.threshold
+            if not changed and (self.max_interval_ms is None or elapsed_ms < self.max_interval_ms):
+                return False
+
+        self.last_emitted = thumbnail
+        self.last_emit_ms = timestamp_ms
+        return True
+
+# Function to work out the output frame size: scale and the max_width /
+# max_height bounds shrink the source while keeping its aspect ratio, and
+# frames are never enlarged
+def output_size(width, height, max_width=None, max_height=None, scale=None):
+    factor = min(scale or 1.0, 1.0)
+    if max_width:
+        factor = min(factor, max_width / width)
+    if max_height:
+        factor = min(factor, max_height / height)
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+# Function to ask the capture backend to decode at a reduced size; most file
+# backends (including FFmpeg) refuse, and frames are then resized after decoding
+def request_decode_size(cap, size):
+    import cv2
+    if size == (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))):
+        return False
+    return cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0]) and cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+
+# Function to resize a frame to the output size if it is not already there
+def resize_frame(frame, size):
+    import cv2
+    if (frame.shape[1], frame.shape[0]) == size:
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+# Collects frames into a columns x rows grid image (a contact sheet)
+class ContactSheet:
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.tiles = []
+        self.first_index = None
+        self.first_ms = None
+
+    @property
+    def full(self):
+        return len(self.tiles) >= self.columns * self.rows
+
+    def add(self, frame, frame_index, timestamp_ms):
+        if not self.tiles:
+            self.first_index = frame_index
+            self.first_ms = timestamp_ms
+        self.tiles.append(frame)
+
+    # Returns the grid image and starts a new sheet; unused cells stay black
+    def render(self):
+        import numpy as np
+        height, width = self.tiles[0].shape[:2]
+        grid = np.zeros((height * self.rows, width * self.columns) + self.tiles[0].shape[2:], self.tiles[0].dtype)
+        for i, tile in enumerate(self.tiles):
+            row, column = divmod(i, self.columns)
+            grid[row * height:(row + 1) * height, column * width:(column + 1) * width] = tile
+        self.tiles = []
+        return grid
+
+# Function to read the presentation timestamp of the last grabbed frame,
+# falling back to the nominal frame rate when the container has none
+def frame_timestamp(cap, frame_index, fps):
+    import cv2
+    timestamp_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if timestamp_ms <= 0 and frame_index > 0:
+        return frame_index * 1000.0 / fps
+    return timestamp_ms
+
+# Function to extract frames at the selected FPS
+# With grab_only, frames are advanced with cap.grab() and only the frames that
+# will be saved are decoded to BGR with cap.retrieve().
+# With seek, the capture jumps straight to each sample timestamp instead of
+# walking the stream; by default it is chosen when samples are far enough
+# apart for that to pay off (see SEEK_RATIO_THRESHOLD).
+# start_ms/end_ms restrict extraction to [start_ms, end_ms) so one video can be
+# split across workers.
+# output is either a directory to write files into, or any in-memory sink
+# with a put() method (such as the queue feeding a ZipWriter) that receives
+# (filename, encoded_bytes) pairs encoded without touching the filesystem.
+# Files go in a subdirectory named after the video (name, by default the file
+# name without its extension) and are named after the source frame index and
+# timestamp, e.g. clip/frame_000150_000005000ms.jpg, so names never collide
+# within a video and do not depend on which worker wrote them.
+# output_format, an OutputFormat, picks the codec (JPEG by default).
+# timer, a StageTimer, receives open/seek/decode/resize/encode/handoff timings.
+# With dedup_threshold, a sampled frame whose hash is within that many bits of
+# the last saved frame is dropped before it is encoded.
+# With scene_threshold, frames sampled at target_fps are only candidates and
+# a frame is kept when SceneDetector sees a scene change.
+# max_width/max_height/scale shrink frames right after decoding (see
+# output_size), and thumbnail_grid=(columns, rows) packs kept frames into
+# contact sheets.
+# progress, if given, is called with a FrameProgress every PROGRESS_INTERVAL
+# seconds and once at the end; it must be picklable for process workers
+# (e.g. the put method of a manager queue). Returns an ExtractionResult;
+# videos that cannot be read are reported as skipped rather than raising, and
+# the result's timings are left for the caller, who owns the timer.
+def extract_frames(
+    video_path, output, target_fps, grab_only=True, seek=None, start_ms=0.0, end_ms=None, timer=None,
+    dedup_threshold=None, scene_threshold=None, scene_min_interval=0.0, scene_max_interval=None,
+    max_width=None, max_height=None, scale=None, thumbnail_grid=None, output_format=None, progress=None,
+    name=None
+):
+    import cv2
+    timer = timer or StageTimer()
+    file_name = os.path.basename(video_path)
+    with timer.span("open", file_name):
+        cap = cv2.VideoCapture(video_path)
+        original_fps = cap.get(cv2.CAP_PROP_FPS)
+
+    if not cap.isOpened():
+        return ExtractionResult(video_path, 0, 0, "unable to open the video", None, None)
+    if not original_fps or original_fps == 0:
+        cap.release()
+        return ExtractionResult(video_path, 0, 0, "unable to determine FPS", None, None)
+
+    video_name = name or os.path.splitext(os.path.basename(video_path))[0]
+    if isinstance(output, str):
+        os.makedirs(os.path.join(output, video_name), exist_ok=True)
+    sampler = FrameSampler(target_fps, start_ms)
+    if seek is None:
+        seek = original_fps / target_fps >= SEEK_RATIO_THRESHOLD
+    size = output_size(
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), max_width, max_height, scale
+    )
+    request_decode_size(cap, size)
+    saved_frames = 0
+    kept_frames = 0
+    decoded_frames = 0
+    started = last_report = time.perf_counter()
+    frame_count = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    start_frame = round(start_ms * original_fps / 1000)
+    end_frame = round(end_ms * original_fps / 1000) if end_ms is not None else frame_count
+    segment_frames = max(0, end_frame - start_frame)
+    last_hash = None
+    scenes = None
+    if scene_threshold is not None:
+        scenes = SceneDetector(scene_threshold, scene_min_interval, scene_max_interval)
+    sheet = ContactSheet(*thumbnail_grid) if thumbnail_grid else None
+    output_format = output_format or OutputFormat()
+    encode_params = output_format.params()
+    batch_frames, batch_indices, batch_timestamps = [], [], []
+
+    # A frame belongs to the segment whose range holds its sample slot
+    def past_end(timestamp_ms):
+        return end_ms is not None and timestamp_ms + TIMESTAMP_TOLERANCE_MS >= end_ms
+
+    # Source frame index and timestamp of the last grabbed frame
+    def grabbed_position():
+        frame_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+        return frame_index, frame_timestamp(cap, frame_index, original_fps)
+
+    def output_name(kind, frame_index, timestamp_ms):
+        return f"{video_name}/{kind}_{frame_index:06d}_{round(timestamp_ms):09d}ms{output_format.extension}"
+
+    def grab():
+        nonlocal decoded_frames
+        decoded_frames += 1
+        with timer.span("decode", file_name):
+            return cap.grab()
+
+    def report_progress(timestamp_ms=None):
+        nonlocal last_report
+        if progress is None:
+            return
+        now = time.perf_counter()
+        if timestamp_ms is None:
+            position = segment_frames
+        elif now - last_report >= PROGRESS_INTERVAL:
+            position = min(segment_frames, max(0, round(timestamp_ms * original_fps / 1000) - start_frame))
+        else:
+            return
+        last_report = now
+        progress(FrameProgress(
+            video_path, start_ms, position, segment_frames, frame_count, saved_frames, decoded_frames, now - started
+        ))
+
+    def retrieve():
+        with timer.span("decode", file_name):
+            return cap.retrieve()
+
+    def write_file(filename, data=None, image=None):
+        if isinstance(output, str):
+            with timer.span("encode", file_name):
+                path = os.path.join(output, filename)
+                if image is not None:
+                    if not cv2.imwrite(path, image, encode_params):
+                        raise ValueError(f"Failed to write {path}")
+                else:
+                    with open(path, "wb") as f:
+                        f.write(data)
+        else:
+            if image is not None:
+                with timer.span("encode", file_name):
+                    data = encode_frame(image, output_format)
+            # Time blocked on a full queue shows up as handoff
+            with timer.span("handoff", file_name):
+                output.put((filename, data))
+
+    # Returns the number of files written: array formats only write once a
+    # batch is full
+    def write_image(image, kind, frame_index, timestamp_ms):
+        if not output_format.is_array:
+            write_file(output_name(kind, frame_index, timestamp_ms), image=image)
+            return 1
+        batch_frames.append(image)
+        batch_indices.append(frame_index)
+        batch_timestamps.append(timestamp_ms)
+        if output_format.batch_size and len(batch_frames) >= output_format.batch_size:
+            return flush_batch()
+        return 0
+
+    def flush_batch():
+        if not batch_frames:
+            return 0
+        filename = output_name("frames", batch_indices[0], batch_timestamps[0])
+        with timer.span("encode", file_name):
+            data = encode_array_batch(batch_frames, batch_timestamps, output_format)
+        batch_frames.clear()
+        batch_indices.clear()
+        batch_timestamps.clear()
+        write_file(filename, data=data)
+        return 1
+
+    # Returns the number of files written for this frame: 0 when it is
+    # dropped as a duplicate, does not start a new scene or is held in a
+    # sheet or array batch that is not full yet
+    def save_frame(frame, frame_index, timestamp_ms):
+        nonlocal last_hash, kept_frames
+        with timer.span("resize", file_name):
+            frame = resize_frame(frame, size)
+        if scenes is not None:
+            with timer.span("scene", file_name):
+                if not scenes.is_new_scene(frame, timestamp_ms):
+                    return 0
+        if dedup_threshold is not None:
+            with timer.span("dedup", file_name):
+                current_hash = frame_hash(frame)
+            if last_hash is not None and hash_distance(current_hash, last_hash) <= dedup_threshold:
+                return 0
+            last_hash = current_hash
+
+        kept_frames += 1
+        if sheet is not None:
+            sheet.add(frame, frame_index, timestamp_ms)
+            return flush_sheet() if sheet.full else 0
+        return write_image(frame, "frame", frame_index, timestamp_ms)
+
+    def flush_sheet():
+        if sheet is None or not sheet.tiles:
+            return 0
+        first_index, first_ms = sheet.first_index, sheet.first_ms
+        return write_image(sheet.render(), "sheet", first_index, first_ms)
+
+    if seek:
+        while True:
+            with timer.span("seek", file_name):
+                cap.set(cv2.CAP_PROP_POS_MSEC, sampler.next_ms)
+            # Grab forward in case the seek landed short of the sample slot
+            while grab():
+                frame_index, timestamp_ms = grabbed_position()
+                report_progress(timestamp_ms)
+                if past_end(timestamp_ms) or sampler.should_sample(timestamp_ms):
+                    break
+            else:
+                break
+            if past_end(timestamp_ms):
+                break
+
+            success, frame = retrieve()
+            if success:
+                saved_frames += save_frame(frame, frame_index, timestamp_ms)
+    else:
+        if start_ms > 0:
+            with timer.span("seek", file_name):
+                cap.set(cv2.CAP_PROP_POS_MSEC, start_ms)
+        while True:
+            if grab_only:
+                if not grab():
+                    break
+            else:
+                decoded_frames += 1
+                with timer.span("decode", file_name):
+                    success, frame = cap.read()
+                if not success:
+                    break
+
+            frame_index, timestamp_ms = grabbed_position()
+            report_progress(timestamp_ms)
+            if past_end(timestamp_ms):
+                break
+            if sampler.should_sample(timestamp_ms):
+                if grab_only:
+                    success, frame = retrieve()
+                if success:
+                    saved_frames += save_frame(frame, frame_index, timestamp_ms)
+
+    saved_frames += flush_sheet()
+    saved_frames += flush_batch()
+    cap.release()
+    report_progress()
+    return ExtractionResult(video_path, kept_frames, saved_frames, None, None, None)
+
+# Function to run extract_frames in a pool worker with a fresh timer and
+# return its ExtractionResult with the timer's records attached, so timings
+# travel back from process workers. An exception is returned in the result as
+# text, so one bad file does not abort the rest of the batch.
+def timed_extract_frames(video_path, *args, **kwargs):
+    timer = StageTimer()
+    try:
+        result = extract_frames(video_path, *args, timer=timer, **kwargs)
+    except Exception as e:
+        error = "".join(traceback.format_exception_only(type(e), e)).strip()
+        result = ExtractionResult(video_path, 0, 0, None, error, None)
+    return result._replace(timings=timer.records())
+
+# Function to combine the results of a video's segments into one result
+def combine_results(results):
+    errors = [result.error for result in results if result.error]
+    return ExtractionResult(
+        results[0].video_path,
+        sum(result.frames for result in results),
+        sum(result.files for result in results),
+        next((result.skipped for result in results if result.skipped), None),
+        "; ".join(errors) or None,
+        [record for result in results for record in result.timings or ()],
+    )
+
+# Progress of one file in a batch, summed over its segments; decode_fps adds
+# up segments decoding in parallel
+FileProgress = collections.namedtuple("FileProgress", ["name", "processed", "frame_count", "saved", "decode_fps"])
+
+# Snapshot of a batch: fraction done (0-1), per-file progress in submission
+# order and frames decoded per second of wall time across the batch
+BatchProgress = collections.namedtuple(
+    "BatchProgress", ["fraction", "files", "decode_fps", "tasks_done", "tasks_total"]
+)
+
+# Collects FrameProgress reports from a batch's workers into BatchProgress
+# snapshots
+class ProgressTracker:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.tasks_done = 0
+        self.tasks_total = 0
+        # Latest report per segment, by file in submission order
+        self._files = {}
+
+    def add_task(self, video_path):
+        self._files.setdefault(video_path, {})
+        self.tasks_total += 1
+
+    def task_done(self):
+        self.tasks_done += 1
+
+    def update(self, report):
+        self._files[report.video_path][report.start_ms] = report
+
+    def snapshot(self):
+        files = []
+        for video_path, segments in self._files.items():
+            reports = segments.values()
+            files.append(FileProgress(
+                os.path.basename(video_path),
+                sum(report.position for report in reports),
+                max((report.frame_count for report in reports), default=0),
+                sum(report.saved for report in reports),
+                sum(report.decoded / report.elapsed for report in reports if report.elapsed > 0),
+            ))
+
+        processed = sum(file.processed for file in files)
+        frame_count = sum(file.frame_count for file in files)
+        # Frame counts are only known once a file has started and not every
+        # container has one, so fall back to finished tasks
+        if self.tasks_total and self.tasks_done == self.tasks_total:
+            fraction = 1.0
+        elif frame_count and all(file.frame_count for file in files):
+            fraction = min(1.0, processed / frame_count)
+        else:
+            fraction = self.tasks_done / self.tasks_total if self.tasks_total else 0.0
+        decoded = sum(report.decoded for segments in self._files.values() for report in segments.values())
+        decode_fps = decoded / max(time.perf_counter() - self.started, 1e-9)
+        return BatchProgress(fraction, files, decode_fps, self.tasks_done, self.tasks_total)
+
+# Function to extract frames from a batch of videos and return one
+# ExtractionResult per video, in the order the videos were given; a video that
+# fails does not stop the others. Each video's files, in the output_format
+# option's format, go in their own directory named by unique_name. output is a
+# ZIP archive, as a path ending in .zip or a file object, or else a directory
+# path, created if missing.
+# video_paths may be a generator that produces files lazily, e.g. while
+# uploads are still being copied; each file is submitted as soon as it is
+# yielded, and num_files must then be given to size the pool. An item may also
+# be a (path, options) pair whose options override the keyword options for
+# that file, e.g. to downscale it.
+# progress, if given, is called on the calling thread with a BatchProgress
+# about every PROGRESS_INTERVAL seconds while workers report back, and once
+# more at the end. Extra keyword options are passed on to extract_frames.
+def extract_batch(
+    video_paths, output, target_fps, backend="threads", max_workers=None, timer=None, num_files=None,
+    progress=None, **options
+):
+    timer = timer or StageTimer()
+    if num_files is None:
+        video_paths = list(video_paths)
+        num_files = len(video_paths)
+
+    segments = segments_per_file(num_files, max_workers) if can_split(options) else 1
+    workers, cv_threads = plan_workers(num_files * segments, max_workers)
+    tracker = ProgressTracker() if progress is not None else None
+    with contextlib.ExitStack() as stack:
+        to_directory = isinstance(output, str) and not output.lower().endswith(".zip")
+        if to_directory:
+            os.makedirs(output, exist_ok=True)
+        if not to_directory or tracker is not None:
+            make_queue = stack.enter_context(open_queue_factory(backend))
+        if to_directory:
+            sink = output
+        else:
+            sink = make_queue(maxsize=FRAME_QUEUE_SIZE)
+            stack.enter_context(ZipWriter(output, sink, timer))
+        if tracker is not None:
+            # Workers only put reports on a queue; they are read back here
+            progress_queue = make_queue()
+            options["progress"] = progress_queue.put
+        executor = stack.enter_context(create_executor(backend, workers, cv_threads))
+
+        # Input position of each pending task; segment results are collected
+        # per input, so a path given twice still yields two results
+        pending = {}
+        segment_results = []
+        used_names = set()
+        for position, item in enumerate(video_paths):
+            video_path, file_options = item if isinstance(item, tuple) else (item, {})
+            segment_results.append([])
+            name = unique_name(video_path, used_names)
+            for start_ms, end_ms in plan_segments(video_path, segments, target_fps):
+                if tracker is not None:
+                    tracker.add_task(video_path)
+                future = executor.submit(
+                    timed_extract_frames, video_path, sink, target_fps, start_ms=start_ms, end_ms=end_ms, name=name,
+                    **{**options, **file_options}
+                )
+                pending[future] = position
+
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, timeout=PROGRESS_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                result = future.result()
+                segment_results[pending.pop(future)].append(result)
+                timer.merge(result.timings)
+            if tracker is not None:
+                # Drain reports before counting tasks done, so a finished
+                # task's final report is never missing from the snapshot
+                while True:
+                    try:
+                        tracker.update(progress_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for _ in done:
+                    tracker.task_done()
+                progress(tracker.snapshot())
+
+    return [combine_results(results) for results in segment_results]
+
+# Function to pick a video's output directory name within a batch: the file
+# name without its extension, so "a.b.mp4" and "a.c.mp4" stay apart, with a
+# counter added when another input already took it (e.g. clip.mp4 in two
+# folders). Names are handed out in input order, so they are deterministic.
+def unique_name(video_path, used_names):
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    name, count = stem, 1
+    while name in used_names:
+        count += 1
+        name = f"{stem}_{count}"
+    used_names.add(name)
+    return name
+
+# Function to size the worker pool for a batch and split the cores between
+# workers so each OpenCV capture does not spin up a full-width thread pool.
+# max_workers is a core budget: OpenCV threads are split from it rather than
+# from every core, so batches sharing the host stay within their share.
+def plan_workers(num_tasks, max_workers=None):
+    import psutil
+    cpu_count = psutil.cpu_count() or 1
+    budget = min(max_workers or cpu_count, cpu_count)
+    workers = max(1, min(num_tasks, budget))
+    cv_threads = max(1, budget // workers)
+    return workers, cv_threads
+
+# Function to split a video into time ranges on the sample grid, at most
+# `segments` of them and none shorter than MIN_SEGMENT_MS
+def plan_segments(video_path, segments, target_fps):
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    original_fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+
+    if not original_fps or total_frames <= 0:
+        return [(0.0, None)]
+
+    duration_ms = total_frames * 1000.0 / original_fps
+    segments = max(1, min(segments, int(duration_ms // MIN_SEGMENT_MS)))
+    step_ms = 1000.0 / target_fps
+    slots = math.ceil(duration_ms / step_ms)
+    bounds = [round(slots * i / segments) * step_ms for i in range(segments)]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+# Function to decide how many segments each file of a batch is split into, so
+# batches with fewer files than cores still use every core
+def segments_per_file(num_files, max_workers=None):
+    import psutil
+    cpu_count = psutil.cpu_count() or 1
+    return max(1, min(max_workers or cpu_count, cpu_count) // max(1, num_files))
+
+# Function to tell whether videos extracted with these extract_frames options
+# can be split into segments. Output that depends on earlier frames of the
+# video cannot: each segment would start afresh, so the result would change
+# with the number of workers.
+def can_split(options):
+    output_format = options.get("output_format")
+    # An unbatched array file holds a whole video
+    if output_format is not None and output_format.is_array and not output_format.batch_size:
+        return False
+    # Scene detection compares each candidate with the last kept frame and
+    # enforces scene_min_interval since it
+    if options.get("scene_threshold") is not None:
+        return False
+    # Dedup compares each frame with the last saved one, so a static video
+    # would keep one frame per segment
+    if options.get("dedup_threshold") is not None:
+        return False
+    # A segment flushes its last, partial contact sheet when it ends
+    if options.get("thumbnail_grid"):
+        return False
+    return True
+
+# Function to apply the OpenCV thread budget inside a pool worker
+def init_worker(cv_threads):
+    import cv2
+    cv2.setNumThreads(cv_threads)
+
+# Function to create the executor for the selected backend
+def create_executor(backend, workers, cv_threads):
+    if backend == "processes":
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+            initializer=init_worker, initargs=(cv_threads,)
+        )
+    # Threads share one OpenCV thread pool, so the budget is set process-wide:
+    # batches running side by side in one process (e.g. app jobs) all use the
+    # setting of the batch that started last, and their OpenCV calls share
+    # that one pool instead of each getting cv_threads of its own
+    init_worker(cv_threads)
+    return concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+# Function to open a factory for queues that extraction workers can reach;
+# process workers need manager-backed queues they can use from another
+# process, and every queue of a batch shares one manager
+@contextlib.contextmanager
+def open_queue_factory(backend):
+    if backend == "processes":
+        with multiprocessing.get_context(PROCESS_START_METHOD).Manager() as manager:
+            yield manager.Queue
+    else:
+        yield queue.Queue
+
+# Function to open the queue extraction workers hand encoded frames to
+@contextlib.contextmanager
+def open_frame_queue(backend):
+    with open_queue_factory(backend) as make_queue:
+        yield make_queue(maxsize=FRAME_QUEUE_SIZE)
+
+# Packs frames into a ZIP archive from a single background thread as workers
+# produce them, so the archive is complete shortly after the last decode.
+# file may be a path or a file object such as io.BytesIO for an in-memory archive.
+# If a write fails (e.g. the disk is full) the thread keeps draining the queue,
+# so workers never block on it, and close() raises the error.
+class ZipWriter:
+    def __init__(self, file, frame_queue, timer=None):
+        self.frame_queue = frame_queue
+        self.timer = timer or StageTimer()
+        self.count = 0
+        self._error = None
+        self._zipf = zipfile.ZipFile(file, "w")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self.frame_queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue
+            arcname, data = item
+            try:
+                with self.timer.span("zip"):
+                    self._zipf.writestr(arcname, data)
+            except Exception as e:
+                self._error = e
+                continue
+            self.count += 1
+
+    def close(self):
+        self.frame_queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            # Release the file; the archive is incomplete either way
+            with contextlib.suppress(Exception):
+                self._zipf.close()
+            raise self._error
+        self._zipf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,219 @@
+import collections
+import itertools
+import os
+import threading
+import time
+import traceback
+import uuid
+
+# Extraction jobs run at the same time; the rest wait in the queue
+JOB_SLOTS = 2
+
+# Seconds a finished job's result is kept for sessions to collect
+JOB_RETENTION_SECONDS = 3600
+
+# Result bytes finished jobs may hold in memory together; the oldest finished
+# jobs are dropped beyond that
+JOB_RESULT_MAX_BYTES = 512 * 1024 ** 2
+
+# One background unit of work. fn(job) runs on a JobQueue thread and may call
+# job.set_progress with a fraction done and optional details (e.g. per-file
+# progress) for display; its return value becomes job.result, and an exception
+# becomes job.error. key identifies the work (e.g. a cache key) so identical
+# submissions can share a job; owner is who submitted it (e.g. a session),
+# for fair queuing; notes are (level, message) pairs, e.g. admission
+# warnings, shown alongside the job. workers is the job's share of the
+# queue's worker budget, set when the job starts, and result_bytes what its
+# result holds in memory.
+class Job:
+    def __init__(self, fn, key=None, owner=None, notes=()):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.key = key
+        self.owner = owner
+        self.notes = list(notes)
+        self.workers = None
+        self.status = "queued"
+        self.progress = 0.0
+        self.details = None
+        self.result = None
+        self.result_bytes = 0
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def set_progress(self, fraction, details=None):
+        self.progress = fraction
+        self.details = details
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+# Runs jobs on process-wide threads so they outlive the script run (and
+# session) that submitted them; any later run can look a job up by its ID.
+# At most `slots` jobs run at once and share worker_budget (default: one per
+# core), so the number of decoders on the host stays within the budget
+# however many sessions submit work; a job's share is set when it starts (see
+# share). Waiting jobs are started round-robin across owners, so one owner's
+# backlog cannot hold everyone else up. Finished jobs are forgotten after
+# retention seconds, or sooner, oldest first, once their results (measured by
+# result_size) add up to more than max_result_bytes.
+class JobQueue:
+    def __init__(
+        self, slots=JOB_SLOTS, worker_budget=None, retention=JOB_RETENTION_SECONDS,
+        max_result_bytes=JOB_RESULT_MAX_BYTES, result_size=None
+    ):
+        self.retention = retention
+        self.max_result_bytes = max_result_bytes
+        self.result_size = result_size or (lambda result: 0)
+        self.worker_budget = worker_budget or os.cpu_count() or 1
+        self.slots = slots
+        self._jobs = {}
+        # Waiting jobs per owner; the owner at the front is served next
+        self._pending = collections.OrderedDict()
+        self._running = 0
+        # Workers handed to running jobs
+        self._busy_workers = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"job-{i}", daemon=True) for i in range(slots)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, key=None, owner=None, notes=()):
+        job = Job(fn, key, owner, notes)
+        with self._cond:
+            self._expire()
+            self._jobs[job.id] = job
+            self._pending.setdefault(owner, collections.deque()).append(job)
+            self._cond.notify()
+        return job
+
+    # Registers a result that is already available (e.g. from the archive
+    # cache) as a finished job, so it is collected like any other
+    def add_finished(self, result, key=None, owner=None, notes=()):
+        job = Job(None, key, owner, notes)
+        job.status = "done"
+        job.result = result
+        job.result_bytes = self.result_size(result)
+        job.started = job.finished = time.time()
+        with self._cond:
+            self._jobs[job.id] = job
+            self._expire()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    # Queued or running job submitted with key, if any
+    def find_active(self, key):
+        with self._cond:
+            self._expire()
+            return next((job for job in self._jobs.values() if job.key == key and job.active), None)
+
+    # 1-based place of a queued job in the start order, or 0 once it has left
+    # the queue
+    def position(self, job):
+        with self._cond:
+            queues = list(self._pending.values())
+            order = [queued for turn in itertools.zip_longest(*queues) for queued in turn if queued is not None]
+        return order.index(job) + 1 if job in order else 0
+
+    # Workers a job starting now would get: every worker the running jobs
+    # leave free, so a job alone on an idle server uses the whole host, but no
+    # more than an equal share per slot while other jobs wait. A job keeps its
+    # share until it finishes, so one started next to a job that took the
+    # whole budget gets a single worker; at most one worker per running job
+    # goes past the budget.
+    def share(self):
+        with self._cond:
+            return self._share()
+
+    def _share(self):
+        free = self.worker_budget - self._busy_workers
+        if self._pending:
+            free = min(free, self.worker_budget // self.slots)
+        return max(1, free)
+
+    # Number of running and waiting jobs
+    def load(self):
+        with self._cond:
+            self._expire()
+            return self._running, sum(len(jobs) for jobs in self._pending.values())
+
+    # Takes the oldest job of the owner at the front and moves that owner to
+    # the back; called with the lock held
+    def _next_job(self):
+        owner, jobs = self._pending.popitem(last=False)
+        job = jobs.popleft()
+        if jobs:
+            self._pending[owner] = jobs
+        return job
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                job = self._next_job()
+                job.workers = self._share()
+                self._running += 1
+                self._busy_workers += job.workers
+            try:
+                self._run(job)
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._busy_workers -= job.workers
+                    self._expire()
+
+    def _run(self, job):
+        job.status = "running"
+        job.started = time.time()
+        result = error = None
+        try:
+            result = job.fn(job)
+            result_bytes = self.result_size(result)
+        except Exception as e:
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            result_bytes = 0
+        # Finished jobs are expired by their finish time, so a job only looks
+        # finished to other threads once that time is set
+        with self._cond:
+            job.fn = None
+            job.result, job.result_bytes, job.error = result, result_bytes, error
+            job.finished = time.time()
+            job.status = "failed" if error is not None else "done"
+
+    # Drops finished jobs past retention, then the oldest finished jobs until
+    # the rest fit in max_result_bytes; called with the lock held
+    def _expire(self):
+        now = time.time()
+        finished = sorted((job for job in self._jobs.values() if not job.active), key=lambda job: job.finished)
+        retained_bytes = sum(job.result_bytes for job in finished)
+        for job in finished:
+            if now - job.finished <= self.retention and retained_bytes <= self.max_result_bytes:
+                break
+            del self._jobs[job.id]
+            retained_bytes -= job.result_bytes
+
+    # Stops the worker threads once every queued job has run
+    def shutdown(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,91 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+# On-disk cache of finished archives, shared by all sessions on this host
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "vexsnip_cache")
+
+# Total size the cache may grow to before least recently used archives are evicted
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Part of every cache key; bump it when the archive layout changes so archives
+# built by older code are not served
+ARCHIVE_LAYOUT_VERSION = 2
+
+# Function to hash a file-like object's content without loading it whole
+def hash_file(fileobj):
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+# Function to build the cache key for a batch from its content hashes and
+# every setting that changes the produced archive
+def cache_key(file_hashes, **settings):
+    payload = json.dumps(
+        {"layout": ARCHIVE_LAYOUT_VERSION, "files": list(file_hashes), "settings": settings}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _archive_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.zip")
+
+# Function to check for a cached archive without reading it
+def is_cached(key):
+    return os.path.exists(_archive_path(key))
+
+# Function to fetch a cached archive, marking it as recently used
+def load_cached_archive(key):
+    path = _archive_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    os.utime(path)
+    return data
+
+# Function to store an archive and evict the least recently used entries once
+# the cache exceeds CACHE_MAX_BYTES
+def store_archive(key, data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, _archive_path(key))
+    evict(CACHE_MAX_BYTES)
+
+# Function to delete the oldest archives until the cache fits in max_bytes
+def evict(max_bytes):
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".zip"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+# Function to count the frames in an archive from its central directory
+def archive_frame_count(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zipf:
+        return len(zipf.namelist())
@@ -0,0 +1,48 @@
+import collections
+import threading
+import time
+
+# Seconds between samples and how many samples the ring buffer keeps
+METRICS_PERIOD = 2.0
+METRICS_HISTORY = 60
+
+MetricsSample = collections.namedtuple("MetricsSample", ["timestamp", "cpu", "ram", "disk"])
+
+# Samples CPU, RAM and disk usage on a background thread into a ring buffer,
+# so readers get the latest values without blocking on psutil. psutil itself
+# is imported on that thread, keeping it off the script's startup path.
+class MetricsSampler:
+    def __init__(self, period=METRICS_PERIOD, history=METRICS_HISTORY, disk_path="/"):
+        self.period = period
+        self.disk_path = disk_path
+        self.samples = collections.deque(maxlen=history)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _sample(self, cpu_interval=None):
+        import psutil
+        self.samples.append(MetricsSample(
+            time.time(),
+            psutil.cpu_percent(interval=cpu_interval),
+            psutil.virtual_memory().percent,
+            psutil.disk_usage(self.disk_path).percent,
+        ))
+
+    def _run(self):
+        # cpu_percent(interval=None) measures since the previous call, so the
+        # first sample uses a short blocking window
+        self._sample(cpu_interval=0.1)
+        while not self._stop.wait(self.period):
+            self._sample()
+
+    # Latest sample, or None until the first one has been taken
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def history(self):
+        return list(self.samples)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,52 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Accumulates time spent per (stage, file, worker) so a batch can be broken
+# down into upload, open, decode, encode, zip and download costs. Records are
+# plain dicts so process workers can send theirs back to be merged.
+class StageTimer:
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, stage, file=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, file)
+
+    def add(self, stage, seconds, file=None, worker=None, count=1):
+        if worker is None:
+            worker = f"{os.getpid()}/{threading.current_thread().name}"
+        key = (stage, file, worker)
+        with self._lock:
+            total, calls = self._totals.get(key, (0.0, 0))
+            self._totals[key] = (total + seconds, calls + count)
+
+    def merge(self, records):
+        for record in records:
+            self.add(record["stage"], record["seconds"], record["file"], record["worker"], record["count"])
+
+    def records(self):
+        with self._lock:
+            items = list(self._totals.items())
+        return [
+            {"stage": stage, "file": file, "worker": worker, "seconds": seconds, "count": count}
+            for (stage, file, worker), (seconds, count) in items
+        ]
+
+    # Totals per stage across all files and workers
+    def summary(self):
+        stages = {}
+        for record in self.records():
+            seconds, count = stages.get(record["stage"], (0.0, 0))
+            stages[record["stage"]] = (seconds + record["seconds"], count + record["count"])
+        return [{"stage": stage, "seconds": seconds, "count": count} for stage, (seconds, count) in stages.items()]
+
+    def to_json(self):
+        return json.dumps({"summary": self.summary(), "records": self.records()}, indent=2)
@@ -1,35 +1,266 @@
 import streamlit as st
-import cv2
+import io
 import os
-import zipfile
+import queue
+import shutil
+import tempfile
+import time
+import uuid
 from tempfile import TemporaryDirectory
-import psutil
-import concurrent.futures
-
-# Function to extract frames at the selected FPS
-def extract_frames(video_path, output_path, target_fps):
-    cap = cv2.VideoCapture(video_path)
-    original_fps = cap.get(cv2.CAP_PROP_FPS)
-
-    if not original_fps or original_fps == 0:
-        st.warning(f"Skipping {os.path.basename(video_path)}, unable to determine FPS.")
-        return 0
-
-    video_name = os.path.basename(video_path).split('.')[0]
-    frame_interval = max(1, int(original_fps / target_fps))  # Ensure non-zero interval
-    success, frame = cap.read()
-    frame_count, saved_frames = 0, 0
-
-    while success:
-        if frame_count % frame_interval == 0:
-            image_filename = f"{video_name}_frame_{int(frame_count // original_fps)}.jpg"
-            cv2.imwrite(os.path.join(output_path, image_filename), frame)
-            saved_frames += 1
-        frame_count += 1
-        success, frame = cap.read()
-
-    cap.release()
-    return saved_frames
+from disk_budget import disk_budget, estimate_job, fit_scale, memory_budget, probe_video
+from job_queue import JobQueue
+from frame_extractor import (
+    ARRAY_BATCH_SIZE, EXECUTION_BACKENDS, OUTPUT_FORMATS, OutputFormat, can_split, extract_batch,
+    plan_workers, segments_per_file
+)
+from result_cache import archive_frame_count, cache_key, hash_file, is_cached, load_cached_archive, store_archive
+from server_metrics import MetricsSampler
+from stage_timer import StageTimer
+from uploads import save_upload
+
+# Seconds between progress refreshes while a background job runs
+JOB_POLL_SECONDS = 1.0
+
+# Function to hash an upload once per session; Streamlit keeps the same
+# file_id for an upload across reruns
+def upload_hash(uploaded_file):
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hash_file(uploaded_file)
+    return hashes[uploaded_file.file_id]
+
+# Function to copy one upload into temp_dir, returning its path; each upload
+# gets its own subdirectory, so two uploads with the same name both survive
+def copy_upload(uploaded_file, index, temp_dir, timer):
+    upload_dir = os.path.join(temp_dir, str(index))
+    os.makedirs(upload_dir)
+    temp_file_path = os.path.join(upload_dir, uploaded_file.name)
+    with timer.span("upload", uploaded_file.name):
+        save_upload(uploaded_file, temp_file_path)
+    return temp_file_path
+
+# Function to check one copied upload of a num_files batch against what is
+# left for the job's output: free space on the temp filesystem, which holds
+# the uploads and the archive cache, and free memory, which holds the archive
+# while it is built, less the committed_bytes that earlier files are expected
+# to take. Returns the options to extract the file with (downscaled when its
+# output would not fit, None to skip it), the bytes its output is expected to
+# take and (level, message) notes for the user.
+def admit_file(video_path, num_files, target_fps, committed_bytes, options):
+    name = os.path.basename(video_path)
+    video = probe_video(video_path)
+    job_workers = get_job_queue().share()
+    segments = segments_per_file(num_files, job_workers) if can_split(options) else 1
+    workers, _ = plan_workers(segments, job_workers)
+    estimate = estimate_job([video], target_fps, workers, **options)
+    notes = [(
+        "caption",
+        f"{name}: up to {estimate.frames} frames, {estimate.output_bytes / 1024 ** 2:.1f} MB, "
+        f"about {estimate.decode_seconds:.0f} s to decode.",
+    )]
+
+    budget = min(disk_budget(tempfile.gettempdir()), memory_budget()) - committed_bytes
+    scale = fit_scale([video], target_fps, budget, **options)
+    if scale is None:
+        notes.append((
+            "error",
+            f"Skipped {name}: its output needs about {estimate.output_bytes / 1024 ** 2:.0f} MB but only "
+            f"{max(budget, 0) / 1024 ** 2:.0f} MB of disk space and memory is left. "
+            "Lower the FPS or the output size.",
+        ))
+        return None, 0, notes
+    if scale != (options.get("scale") or 1.0):
+        options = {**options, "scale": scale}
+        notes.append((
+            "warning",
+            f"Not enough free disk space or memory for full-size frames of {name}; they are scaled to {scale:.0%}.",
+        ))
+    return options, estimate_job([video], target_fps, workers, **options).output_bytes, notes
+
+# Function to show (level, message) notes with the matching st call
+def display_notes(notes):
+    for level, message in notes:
+        getattr(st, level)(message)
+
+# One job queue shared by every session on the server, so extraction keeps
+# running when the script is rerun or the browser reconnects. Job results are
+# (archive, per-file results, timer); archive is None when it lives in the
+# archive cache, so only archives that could not be cached count towards the
+# queue's memory bound.
+@st.cache_resource
+def get_job_queue():
+    return JobQueue(result_size=lambda result: len(result[0] or b""))
+
+# Function to identify this browser session to the job queue, which takes
+# turns between sessions when starting queued jobs
+def session_owner():
+    return st.session_state.setdefault("owner", uuid.uuid4().hex)
+
+# Function to queue a background job that extracts the uploads into an
+# in-memory ZIP archive, then copy the uploads into a directory the job owns;
+# options go to extract_frames. Uploads belong to this session, so they are
+# copied here, and each one is handed to the job as soon as its copy is
+# admitted by admit_file, so a job that starts right away decodes while the
+# rest are still copying. The job deletes its directory when it finishes.
+# The job's result is (archive, per-file ExtractionResults, timer). Returns
+# the job, or None when the uploads do not fit on disk.
+def submit_extraction(uploaded_files, key, target_fps, backend, timer, options):
+    start = time.perf_counter()
+    upload_bytes = sum(uploaded_file.size for uploaded_file in uploaded_files)
+    if upload_bytes > disk_budget(tempfile.gettempdir()):
+        st.error("Not enough free disk space to store the uploaded videos.")
+        return None
+
+    job_dir = tempfile.mkdtemp(prefix="vexsnip_job_")
+    # (path, options) per admitted upload, then None once every upload is done
+    admitted = queue.Queue()
+
+    def admitted_files():
+        while True:
+            item = admitted.get()
+            if item is None:
+                return
+            yield item
+
+    def run(job):
+        try:
+            archive = io.BytesIO()
+            results = extract_batch(
+                admitted_files(), archive, target_fps, backend, job.workers, timer=timer,
+                num_files=len(uploaded_files), progress=lambda batch: job.set_progress(batch.fraction, batch),
+                **options
+            )
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        # With no views of the buffer left, getvalue() trims it and hands it
+        # over without copying, so the archive is never in memory twice
+        archive = archive.getvalue()
+        # A downscaled or partial archive does not match the requested
+        # settings and uploads
+        complete = not any(result.error or result.skipped for result in results)
+        if complete and exact and any(result.files for result in results):
+            with timer.span("cache"):
+                store_archive(key, archive)
+            # Served from the cache from now on instead of held in memory
+            archive = None
+        timer.add("total", time.perf_counter() - start)
+        return archive, results, timer
+
+    job = get_job_queue().submit(run, key, session_owner())
+    # Set once every upload is copied and admitted with the requested options;
+    # the job only reads it after the last upload is handed over
+    exact = False
+    committed_bytes = 0
+    try:
+        changed = False
+        for i, uploaded_file in enumerate(uploaded_files):
+            video_path = copy_upload(uploaded_file, i, job_dir, timer)
+            file_options, output_bytes, notes = admit_file(
+                video_path, len(uploaded_files), target_fps, committed_bytes, options
+            )
+            job.notes.extend(notes)
+            if file_options is None:
+                changed = True
+                continue
+            changed = changed or file_options is not options
+            committed_bytes += output_bytes
+            admitted.put((video_path, file_options))
+        exact = not changed
+    finally:
+        admitted.put(None)
+    return job
+
+# Function to show a background job's progress; it refreshes on its own and
+# reruns the whole app once the job has finished
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def display_job_progress(job_id):
+    job_queue = get_job_queue()
+    job = job_queue.get(job_id)
+    if job is None or not job.active:
+        st.rerun()
+    if job.status == "queued":
+        running, _ = job_queue.load()
+        st.progress(
+            0.0, text=f"Queued at position {job_queue.position(job)}, {running} job(s) running on the server..."
+        )
+    else:
+        st.progress(job.progress, text=f"Extracting frames... {job.elapsed():.0f} s")
+        if job.details is not None:
+            display_batch_progress(job.details)
+
+# Function to show per-file progress bars and the batch's decode throughput
+def display_batch_progress(batch):
+    st.caption(f"Decoding {batch.decode_fps:.0f} frames/s across all files.")
+    for file in batch.files:
+        if not file.frame_count:
+            st.progress(0.0, text=f"{file.name}: waiting")
+            continue
+        st.progress(
+            min(1.0, file.processed / file.frame_count),
+            text=f"{file.name}: {file.processed}/{file.frame_count} frames, {file.saved} saved, "
+                 f"{file.decode_fps:.0f} frames/s",
+        )
+
+# Function to show what happened to each file of a finished job: skipped and
+# failed files first, then a per-file table
+def display_file_results(results):
+    for result in results:
+        name = os.path.basename(result.video_path)
+        if result.error:
+            st.error(f"{name} failed: {result.error}")
+        elif result.skipped:
+            st.warning(f"Skipped {name}: {result.skipped}.")
+    with st.expander("Per-file results"):
+        st.dataframe([
+            {
+                "file": os.path.basename(result.video_path),
+                "frames kept": result.frames,
+                "files written": result.files,
+                "status": "failed" if result.error else "skipped" if result.skipped else "ok",
+                "worker seconds": sum(record["seconds"] for record in result.timings),
+            }
+            for result in results
+        ])
+
+# Function to show a finished job's frames, per-file outcomes and timings.
+# Results served from the archive cache have no per-file breakdown.
+def display_job_result(job):
+    archive, results, job_timer = job.result
+    # Downloads are timed per render on top of the job's own timings
+    timer = StageTimer()
+    timer.merge(job_timer.records())
+    if archive is None:
+        with timer.span("cache"):
+            archive = load_cached_archive(job.key)
+        if archive is None:
+            st.warning("These frames have been evicted from the cache; extract them again.")
+            return
+    if results is None:
+        written_files = archive_frame_count(archive)
+        message = f"Loaded {written_files} files from the cache."
+    else:
+        display_file_results(results)
+        written_files = sum(result.files for result in results)
+        kept_frames = sum(result.frames for result in results)
+        message = f"Kept {kept_frames} frames in {written_files} files."
+
+    if written_files > 0:
+        st.success(message)
+
+        with timer.span("download"):
+            st.download_button(
+                "Download Extracted Frames", archive, "extracted_frames.zip", "application/zip"
+            )
+    else:
+        st.warning("No frames extracted.")
+    display_timings(timer)
+
+# Function to show where the last run spent its time, with a JSON export
+def display_timings(timer):
+    with st.expander("Timings"):
+        st.caption("Seconds summed across workers, so stages can add up to more than the wall time.")
+        st.dataframe(timer.summary())
+        st.download_button("Download Timings (JSON)", timer.to_json(), "timings.json", "application/json")
 
 # Function to hide Streamlit UI elements
 def hide_streamlit_elements():
@@ -39,14 +270,31 @@ def hide_streamlit_elements():
         </style>
     """, unsafe_allow_html=True)
 
-# Function to display server metrics
+# One metrics sampler thread shared by every session on the server; disk usage
+# is read for the temp filesystem, where uploads and archives are written
+@st.cache_resource
+def get_metrics_sampler():
+    return MetricsSampler(disk_path=tempfile.gettempdir())
+
+# Function to display server metrics from the background sampler
 def display_server_metrics():
+    sampler = get_metrics_sampler()
+    latest = sampler.latest()
     st.sidebar.header("Server Resource Usage")
-    st.sidebar.metric("CPU Usage", f"{psutil.cpu_percent(interval=1)}%")
-    mem = psutil.virtual_memory()
-    st.sidebar.metric("RAM Usage", f"{mem.percent}%")
-    disk = psutil.disk_usage('/')
-    st.sidebar.metric("Disk Usage", f"{disk.percent}%")
+    if latest is None:
+        st.sidebar.caption("Collecting metrics...")
+        return
+    st.sidebar.metric("CPU Usage", f"{latest.cpu}%")
+    st.sidebar.metric("RAM Usage", f"{latest.ram}%")
+    st.sidebar.metric("Temp Disk Usage", f"{latest.disk}%")
+    running, queued = get_job_queue().load()
+    st.sidebar.metric("Extraction Jobs", f"{running} running, {queued} queued")
+
+    history = sampler.history()
+    if len(history) > 1:
+        st.sidebar.line_chart(
+            {"CPU %": [s.cpu for s in history], "RAM %": [s.ram for s in history]}, height=120
+        )
 
 # Main Streamlit app
 def main():
@@ -61,43 +309,102 @@ def main():
         "Upload video files", type=["mp4", "avi", "mkv", "mov"], accept_multiple_files=True
     )
     
-    target_fps = st.slider("Select FPS", min_value=1, max_value=30, value=1)
-
-    if uploaded_files:
-        with TemporaryDirectory() as temp_dir:
-            output_folder = os.path.join(temp_dir, "screenshots")
-            os.makedirs(output_folder, exist_ok=True)
-
-            saved_file_paths = []
-            for uploaded_file in uploaded_files:
-                temp_file_path = os.path.join(temp_dir, uploaded_file.name)
-                with open(temp_file_path, "wb") as f:
-                    f.write(uploaded_file.read())
-                saved_file_paths.append(temp_file_path)
-
-            total_saved_frames = 0
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = {
-                    executor.submit(extract_frames, file_path, output_folder, target_fps): file_path
-                    for file_path in saved_file_paths
-                }
-
-                for future in concurrent.futures.as_completed(futures):
-                    total_saved_frames += future.result()
-
-            if total_saved_frames > 0:
-                st.success(f"Extracted {total_saved_frames} frames.")
-
-                zip_path = os.path.join(temp_dir, "frames.zip")
-                with zipfile.ZipFile(zip_path, "w") as zipf:
-                    for root, _, files in os.walk(output_folder):
-                        for file in files:
-                            zipf.write(os.path.join(root, file), arcname=file)
-
-                with open(zip_path, "rb") as zipf:
-                    st.download_button("Download Extracted Frames", zipf, "extracted_frames.zip", "application/zip")
-            else:
-                st.warning("No frames extracted.")
+    sampling = st.radio("Sampling mode", ["Fixed FPS", "Scene changes"], horizontal=True)
+    if sampling == "Fixed FPS":
+        target_fps = st.slider("Select FPS", min_value=1, max_value=30, value=1)
+    else:
+        target_fps = st.slider(
+            "Analysis FPS", min_value=1, max_value=30, value=2,
+            help="Frames per second checked for a scene change; only changed frames are kept.",
+        )
+    backend = st.selectbox("Execution backend", EXECUTION_BACKENDS)
+
+    # Extraction settings that change the output; they are part of the cache key
+    options = {}
+    if sampling == "Scene changes":
+        options["scene_threshold"] = st.slider(
+            "Scene change threshold (mean gray-level difference)", min_value=1, max_value=100, value=20
+        )
+        min_col, max_col = st.columns(2)
+        options["scene_min_interval"] = min_col.number_input(
+            "Minimum seconds between frames", min_value=0.0, value=1.0, step=0.5
+        )
+        options["scene_max_interval"] = max_col.number_input(
+            "Maximum seconds between frames (0 = no limit)", min_value=0.0, value=0.0, step=5.0
+        ) or None
+    with st.expander("Output size"):
+        width_col, height_col = st.columns(2)
+        options["max_width"] = width_col.number_input(
+            "Max width (0 = original)", min_value=0, value=0, step=64
+        ) or None
+        options["max_height"] = height_col.number_input(
+            "Max height (0 = original)", min_value=0, value=0, step=64
+        ) or None
+        if st.checkbox("Pack frames into thumbnail grids"):
+            columns_col, rows_col = st.columns(2)
+            options["thumbnail_grid"] = (
+                columns_col.number_input("Columns", min_value=1, value=4),
+                rows_col.number_input("Rows", min_value=1, value=4),
+            )
+    with st.expander("Output format"):
+        format_name = st.selectbox(
+            "Format", OUTPUT_FORMATS,
+            help="npy/npz pack frames into NumPy arrays, e.g. for ML ingestion, instead of one image per frame.",
+        )
+        format_settings = {}
+        if format_name in ("jpg", "webp"):
+            format_settings["quality"] = st.slider("Quality", min_value=1, max_value=100, value=95)
+        if format_name == "jpg":
+            format_settings["progressive"] = st.checkbox("Progressive")
+            format_settings["optimize"] = st.checkbox("Optimize Huffman tables")
+        elif format_name == "png":
+            format_settings["png_compression"] = st.slider("Compression level", min_value=0, max_value=9, value=1)
+        elif format_name in ("npy", "npz"):
+            format_settings["batch_size"] = st.number_input(
+                "Frames per file (0 = one file per video)", min_value=0, value=ARRAY_BATCH_SIZE, step=64
+            )
+        output_format = OutputFormat(format_name, **format_settings)
+    if st.checkbox("Skip near-duplicate frames", help="Useful for screen recordings and static cameras."):
+        options["dedup_threshold"] = st.slider(
+            "Duplicate threshold (differing hash bits)", min_value=0, max_value=16, value=4
+        )
+
+    if uploaded_files and st.button("Extract Frames"):
+        timer = StageTimer()
+        # Identical requests are served from the archive cache instead of
+        # decoding the uploads again, or join a job that is already running
+        with timer.span("cache"):
+            key = cache_key(
+                [upload_hash(f) for f in uploaded_files], target_fps=target_fps,
+                output_format=output_format.settings(), **options
+            )
+            cached = is_cached(key)
+        job_queue = get_job_queue()
+        if cached:
+            # The archive is read from the cache when it is shown
+            job = job_queue.add_finished((None, None, timer), key)
+        else:
+            job = job_queue.find_active(key) or submit_extraction(
+                uploaded_files, key, target_fps, backend, timer, {**options, "output_format": output_format}
+            )
+        if job is not None:
+            # The job ID also goes in the URL, so a reconnected browser finds it
+            st.session_state["job_id"] = st.query_params["job"] = job.id
+
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    job = get_job_queue().get(job_id) if job_id else None
+    if job_id and job is None:
+        st.info("The last extraction's results have expired; extract the frames again.")
+        st.session_state.pop("job_id", None)
+        st.query_params.pop("job", None)
+    if job is not None:
+        display_notes(job.notes)
+        if job.active:
+            display_job_progress(job.id)
+        elif job.status == "failed":
+            st.error(f"Extraction failed: {job.error}")
+        else:
+            display_job_result(job)
 
     # Self-hosting and Source Code link
     st.markdown(
@@ -0,0 +1,31 @@
+import os
+import shutil
+
+import pytest
+
+
+# Session-wide synthetic clip: 4 s of 30 FPS, 160x120, with a moving gradient
+# so no two frames are identical
+@pytest.fixture(scope="session")
+def video_path(tmp_path_factory):
+    import cv2
+    import numpy as np
+    path = str(tmp_path_factory.mktemp("videos") / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (160, 120))
+    base = np.tile(np.linspace(0, 255, 160, dtype=np.uint8), (120, 1))
+    for i in range(120):
+        frame = np.roll(base, i * 4, axis=1)
+        writer.write(cv2.merge([frame, np.flipud(frame), np.full_like(frame, i * 2)]))
+    writer.release()
+    return path
+
+
+# Copies of the clip under names that collided with the old naming scheme
+@pytest.fixture
+def colliding_paths(video_path, tmp_path):
+    paths = []
+    for name in ("a.b.mp4", "a.c.mp4"):
+        path = os.path.join(tmp_path, name)
+        shutil.copy(video_path, path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,21 @@
+import pytest
+
+import cli
+
+
+@pytest.mark.parametrize("fps", ["0", "-1"])
+def test_fps_must_be_positive(video_path, tmp_path, fps):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main([video_path, "--fps", fps, "--output-dir", str(tmp_path)])
+    assert exit_info.value.code == 2
+
+
+def test_zip_needs_a_zip_suffix(video_path, tmp_path):
+    with pytest.raises(SystemExit):
+        cli.main([video_path, "--zip", str(tmp_path / "frames")])
+
+
+def test_missing_output_directory_is_created(video_path, tmp_path):
+    output_dir = tmp_path / "new" / "frames"
+    assert cli.main([video_path, "--fps", "2", "--backend", "threads", "--output-dir", str(output_dir)]) == 0
+    assert len(list((output_dir / "clip").iterdir())) == 8
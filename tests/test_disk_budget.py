@@ -0,0 +1,14 @@
+from disk_budget import VideoInfo, fit_scale
+
+
+def test_unreadable_video_fits_any_budget():
+    assert fit_scale([VideoInfo(0, 0, 0, 0)], 1, -10) == 1.0
+
+
+def test_output_is_scaled_down_to_fit():
+    video = VideoInfo(30.0, 300, 1920, 1080)
+    full = fit_scale([video], 1, 10 ** 12)
+    scaled = fit_scale([video], 1, 2 * 1024 ** 2)
+    assert full == 1.0
+    assert scaled is not None and scaled < 1.0
+    assert fit_scale([video], 1, 1024) is None
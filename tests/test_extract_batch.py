@@ -0,0 +1,101 @@
+import io
+import os
+import zipfile
+
+import psutil
+import pytest
+
+import frame_extractor
+from frame_extractor import EXECUTION_BACKENDS, OutputFormat, extract_batch
+
+
+# a.b.mp4 and a.c.mp4 used to share the stem "a", the same path twice shares
+# every name, and 5 FPS puts several frames in each second
+@pytest.mark.parametrize("backend", EXECUTION_BACKENDS)
+def test_saved_count_matches_archive(colliding_paths, backend):
+    archive = io.BytesIO()
+    results = extract_batch(colliding_paths + colliding_paths[:1], archive, 5, backend)
+
+    with zipfile.ZipFile(archive) as zipf:
+        names = zipf.namelist()
+    assert len(results) == 3
+    assert all(result.error is None and result.skipped is None for result in results)
+    assert sum(result.files for result in results) == len(set(names)) == len(names)
+    assert {name.split("/")[0] for name in names} == {"a.b", "a.c", "a.b_2"}
+
+
+def test_saved_count_matches_directory(colliding_paths, tmp_path):
+    output_dir = tmp_path / "frames"
+    output_dir.mkdir()
+    results = extract_batch(colliding_paths + colliding_paths[:1], str(output_dir), 5)
+
+    files = [os.path.join(root, file) for root, _, names in os.walk(output_dir) for file in names]
+    assert sum(result.files for result in results) == len(files) == 3 * 20
+
+
+@pytest.mark.parametrize("grid, output_format", [((2, 2), OutputFormat()), (None, OutputFormat("npz", batch_size=8))])
+def test_grouped_outputs_match_archive(colliding_paths, grid, output_format):
+    archive = io.BytesIO()
+    results = extract_batch(colliding_paths, archive, 5, thumbnail_grid=grid, output_format=output_format)
+
+    with zipfile.ZipFile(archive) as zipf:
+        names = zipf.namelist()
+    assert sum(result.frames for result in results) == 2 * 20
+    assert sum(result.files for result in results) == len(set(names)) == len(names)
+
+
+def test_unbatched_array_is_one_file_per_video(video_path):
+    archive = io.BytesIO()
+    results = extract_batch([video_path], archive, 5, max_workers=4, output_format=OutputFormat("npy", batch_size=0))
+
+    with zipfile.ZipFile(archive) as zipf:
+        names = zipf.namelist()
+    assert [result.frames for result in results] == [20]
+    assert len(names) == 1
+
+
+def test_failed_image_write_is_reported(video_path, tmp_path):
+    # A directory where the first frame should go makes cv2.imwrite fail
+    (tmp_path / "clip" / "frame_000000_000000000ms.jpg").mkdir(parents=True)
+    results = extract_batch([video_path], str(tmp_path), 5)
+
+    assert "Failed to write" in results[0].error
+
+
+# Output that depends on earlier frames of a video must not change when the
+# video is split across more workers
+@pytest.mark.parametrize("options", [
+    {"output_format": OutputFormat("npy", batch_size=0)},
+    {"scene_threshold": 1, "scene_min_interval": 1.5},
+    {"dedup_threshold": 64},
+    {"thumbnail_grid": (3, 3)},
+])
+def test_unsplittable_output_ignores_worker_count(video_path, monkeypatch, options):
+    monkeypatch.setattr(frame_extractor, "MIN_SEGMENT_MS", 1000)
+    monkeypatch.setattr(psutil, "cpu_count", lambda *args, **kwargs: 4)
+    names = []
+    for workers in (1, 4):
+        archive = io.BytesIO()
+        extract_batch([video_path], archive, 10, max_workers=workers, **options)
+        with zipfile.ZipFile(archive) as zipf:
+            names.append(sorted(zipf.namelist()))
+    assert names[0] == names[1]
+
+
+# Admission counts an in-memory archive once, so taking its bytes must hand
+# over the buffer rather than copy it
+def test_archive_bytes_are_not_copied(video_path):
+    archive = io.BytesIO()
+    extract_batch([video_path], archive, 5)
+
+    data = archive.getvalue()
+    assert data
+    assert archive.getvalue() is data
+
+
+def test_missing_directory_is_created_not_zipped(video_path, tmp_path):
+    output_dir = tmp_path / "frames"
+    results = extract_batch([video_path], str(output_dir), 5)
+
+    assert output_dir.is_dir()
+    assert results[0].files == len(list((output_dir / "clip").iterdir()))
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from job_queue import JobQueue
+
+
+def test_finished_results_are_bounded_oldest_first():
+    queue = JobQueue(slots=1, max_result_bytes=10, result_size=len)
+    old = queue.add_finished(b"x" * 6)
+    new = queue.add_finished(b"y" * 6)
+    assert queue.get(old.id) is None
+    assert queue.get(new.id) is new
+    queue.shutdown()
+
+
+def test_finished_jobs_expire_on_lookup():
+    queue = JobQueue(slots=1, retention=0)
+    job = queue.add_finished(b"")
+    job.finished -= 1
+    assert queue.get(job.id) is None
+    queue.shutdown()
+
+
+def test_job_alone_gets_the_whole_budget():
+    queue = JobQueue(slots=2, worker_budget=8)
+    job = queue.submit(lambda job: job.workers)
+    queue.shutdown()
+    assert job.result == 8
+
+
+def test_jobs_started_together_share_the_budget():
+    queue = JobQueue(slots=2, worker_budget=8)
+    # Both jobs run until both have started
+    started = threading.Barrier(2)
+
+    def hold(job):
+        started.wait()
+        return job.workers
+
+    # Both jobs are queued before either starts; the first sees the second
+    # waiting and the second finds only the first's share in use
+    with queue._cond:
+        jobs = [queue.submit(hold) for _ in range(2)]
+    queue.shutdown()
+    assert [job.result for job in jobs] == [4, 4]
+
+
+def test_job_next_to_a_busy_one_gets_what_is_left():
+    queue = JobQueue(slots=2, worker_budget=8)
+    started, release = threading.Event(), threading.Event()
+
+    def hold(job):
+        started.set()
+        release.wait()
+        return job.workers
+
+    first = queue.submit(hold)
+    started.wait()
+    second = queue.submit(lambda job: job.workers)
+    while second.active:
+        time.sleep(0.01)
+    release.set()
+    queue.shutdown()
+    assert (first.result, second.result) == (8, 1)
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from frame_extractor import TIMESTAMP_TOLERANCE_MS, FrameSampler
+
+
+# Function to run a sampler over a stream's presentation timestamps and return
+# the timestamps it picks
+def sample(timestamps_ms, target_fps, start_ms=0.0):
+    sampler = FrameSampler(target_fps, start_ms)
+    return [timestamp_ms for timestamp_ms in timestamps_ms if sampler.should_sample(timestamp_ms)]
+
+
+def test_ntsc_to_7_fps_emits_exact_rate_without_drift():
+    frame_ms = 1000 / 29.97
+    timestamps = [i * frame_ms for i in range(int(29.97 * 600))]
+    picked = sample(timestamps, 7)
+
+    # One sample per 1/7 s slot over ten minutes, not the 7.49 FPS of a
+    # truncated 4-frame interval
+    assert len(picked) == 7 * 600
+    step_ms = 1000 / 7
+    for k, timestamp_ms in enumerate(picked):
+        # Each sample is the first frame at or after its slot, so it never
+        # lags its slot by a whole frame, even at the end of the file
+        assert k * step_ms - TIMESTAMP_TOLERANCE_MS <= timestamp_ms < k * step_ms + frame_ms
+    gaps = [b - a for a, b in zip(picked, picked[1:])]
+    assert min(gaps) > step_ms - frame_ms
+    assert max(gaps) < step_ms + frame_ms
+
+
+def test_jittered_frame_gaps_keep_samples_on_the_grid():
+    rng = random.Random(3)
+    timestamps, timestamp_ms = [], 0.0
+    while timestamp_ms < 60_000:
+        timestamps.append(timestamp_ms)
+        timestamp_ms += rng.uniform(10, 60)
+    picked = sample(timestamps, 5)
+
+    step_ms = 200
+    slots_covered = {int((t + TIMESTAMP_TOLERANCE_MS) // step_ms) for t in timestamps}
+    assert len(picked) == len(slots_covered)
+    for k, timestamp_ms in enumerate(picked):
+        assert k * step_ms - TIMESTAMP_TOLERANCE_MS <= timestamp_ms < k * step_ms + 60
+    gaps = [b - a for a, b in zip(picked, picked[1:])]
+    assert min(gaps) > step_ms - 60
+    assert max(gaps) < step_ms + 60
+
+
+def test_multi_second_gap_yields_one_sample_then_resumes_on_grid():
+    frame_ms = 1000 / 30
+    # 2 s of frames, a 5 s hole (e.g. a paused screen recording), 2 s more
+    before = [i * frame_ms for i in range(60)]
+    after = [7000 + i * frame_ms for i in range(60)]
+    picked = sample(before + after, 2)
+
+    # Slots 0-1500 ms, then one frame for every slot the hole skipped, then
+    # 7500-8500 ms; no burst of catch-up samples after the gap
+    assert picked[:4] == pytest.approx([0, 500, 1000, 1500], abs=frame_ms)
+    assert picked[4] == 7000
+    assert picked[5:] == pytest.approx([7500, 8000, 8500], abs=frame_ms)
+    assert len(picked) == 8
+
+
+def test_segment_start_aligns_to_global_grid():
+    frame_ms = 1000 / 30
+    timestamps = [i * frame_ms for i in range(300)]
+    whole = sample(timestamps, 3)
+    # A segment starting mid-slot picks up exactly where the whole-file run
+    # would, so split videos produce the same samples
+    first = sample([t for t in timestamps if t < 4100], 3)
+    second = sample([t for t in timestamps if t >= 4100], 3, start_ms=4100)
+    assert first + second == whole
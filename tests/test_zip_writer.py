@@ -0,0 +1,29 @@
+import io
+import queue
+
+import pytest
+
+from frame_extractor import ZipWriter
+
+
+# Archive file that runs out of space after limit bytes
+class FullFile(io.BytesIO):
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, data):
+        if self.tell() + len(data) > self.limit:
+            raise OSError(28, "No space left on device")
+        return super().write(data)
+
+
+def test_write_error_is_raised_from_close_without_blocking_producers():
+    frame_queue = queue.Queue(maxsize=1)
+    writer = ZipWriter(FullFile(4096), frame_queue)
+    for i in range(10):
+        frame_queue.put((f"frame_{i}.jpg", b"x" * 1024), timeout=5)
+
+    with pytest.raises(OSError, match="No space left"):
+        writer.close()
+    assert writer.count < 10
@@ -0,0 +1,11 @@
+import shutil
+
+# Buffer size for copying uploads to disk, so a file is never held in memory twice
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Function to stream an uploaded file (any binary file object) to disk in
+# fixed-size chunks
+def save_upload(uploaded_file, path):
+    uploaded_file.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(uploaded_file, f, COPY_BUFFER_SIZE)